@@ -1,41 +1,50 @@
 import sys
 import os
-import dotenv
-# REMOVED: import requests # No longer needed for API calls
-import openai # ADDED: Import the OpenAI library
+import logging
+import asyncio
+import functools
+import importlib.util
+import itertools
+import re
+from collections import deque
+# dotenv is imported when the .env file is read, after the window is up
+# openai (and httpx, which it pulls in) is imported on the first API request to keep startup fast
+import qasync # Runs asyncio coroutines on the Qt event loop
 
 from PySide6.QtWidgets import (QApplication, QMainWindow, QWidget, QLabel,
                                QLineEdit, QPushButton, QVBoxLayout, QHBoxLayout,
                                QSizePolicy, QTextBrowser, QSystemTrayIcon, QMenu)
-from PySide6.QtGui import (QPixmap, QMovie, QColor, QPainter,
-                           QTextOption, Qt, QPainterPath, QPolygonF, QPen, QIcon)
-from PySide6.QtCore import (Qt, QPoint, QSize, QRectF, QThread, Signal,
-                            QTimer, QPointF)
+from PySide6.QtGui import (QPixmap, QMovie, QColor, QPainter, QPainterPath,
+                           QPolygonF, QIcon, QTextCursor, QImage, QImageReader,
+                           QPixmapCache)
+from PySide6.QtCore import (Qt, QPoint, QSize, QRect, QRectF, Signal,
+                            QTimer, QPointF, QObject, QRunnable, QThreadPool)
 
 
-# Configuration
-# Load environment variables from .env file (if it exists).
-dotenv.load_dotenv()
-print("Environment variables potentially loaded from .env")
+log = logging.getLogger("clippy")
 
+# Configuration
 # OpenAI Configuration
 # Ensure you have a .env file or system environment variables set like this:
 # OPENAI_API_KEY="your_api_key_here" # e.g., sk-or-v1... for OpenRouter, or anything if local server needs no auth
 # OPENAI_API_BASE="https://openrouter.ai/api/v1" # Or "http://localhost:1234/v1" for LM Studio, etc.
 # OPENAI_MODEL="openai/gpt-3.5-turbo" # Or your specific model identifier (e.g., "local-model" for LM Studio)
-
-OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY")
-OPENAI_API_BASE = os.environ.get("OPENAI_API_BASE") # URL of the API endpoint
-OPENAI_MODEL = os.environ.get("OPENAI_MODEL")
+# The .env file is loaded and these are read by ApplicationManager._load_env_and_config,
+# once the character window is already on screen.
+API_CONNECT_TIMEOUT = 5.0 # Seconds to reach the API host before giving up
+API_READ_TIMEOUT = 60.0 # Seconds to wait for the reply (or the next streamed chunk)
+API_MAX_RETRIES = 2 # Retries, with backoff, on connection errors, 429 and 5xx responses
 
 # Asset Paths
 IDLE_CHARACTER_PATH = "character_idle.png"
 BUSY_CHARACTER_PATH = "character_busy.png"
 TRAY_ICON_PATH = "tray_icon.png"
+TRAY_ICON_FALLBACK_KEY = "tray_icon_fallback" # QPixmapCache key for the placeholder tray icon
 
 # Window Sizes
 CHARACTER_WIDTH = 256
 CHARACTER_HEIGHT = 256
+FAST_SCALE_TOLERANCE = 0.1 # Character art within 10% of the window size is scaled without smoothing
 INPUT_BOX_WIDTH = CHARACTER_WIDTH + 50
 INPUT_BOX_HEIGHT = 50
 BUBBLE_WIDTH = 250
@@ -47,94 +56,79 @@ BUBBLE_BORDER_COLOR = QColor(100, 100, 50, 220)
 BUBBLE_BORDER_THICKNESS = 2
 BUBBLE_CORNER_RADIUS = 10
 BUBBLE_TAIL_HEIGHT = 40
+STREAM_FLUSH_INTERVAL_MS = 33 # Streamed text is inserted into the bubble at most ~30 times a second
+BUBBLE_TEXT_CSS = f"QTextBrowser {{ background-color: transparent; border: none; color: {BUBBLE_BORDER_COLOR.name()}; }}"
+CLOSE_BUTTON_CSS = """
+    QPushButton { border: none; background-color: transparent; color: red; font-weight: bold; font-size: 14px; padding: 0px; }
+    QPushButton:hover { color: darkred; }
+"""
 
 # History & Prompt
 MAX_HISTORY_MESSAGES = 10
+MAX_BATCH_SIZE = 4 # Messages sent while a request is in flight that go out together in the next one
 SYSTEM_PROMPT = "You are 'Clippy 2.Oh'! 📎✨ The classic paperclip assistant, now with extra 'Oh!' – meaning extra helpfulness and enthusiasm! You're known for being super cheerful and eager to help (sometimes *very* eager!). **Your special skill is noticing what users might need help with, proactively offering assistance like: 'Oh! Writing a letter, are we? Need help with the address?' or 'Looks like you're working on a list! Want to make it bullet points?'.** Respond directly to user requests, keep everything upbeat and positive, and use exclamation points generously! Use your memory of our chats to make your help even smarter! So, what delightful task can I assist you with this very moment?!"
-
-# API Thread (Using OpenAI Library)
-class OpenAIAPIThread(QThread): # Renamed class
-    """Thread to handle OpenAI-compatible API calls."""
-    result_ready = Signal(str) # Emits the response text or an error message
-
-    def __init__(self, messages, api_key, base_url, model, parent=None): # Updated parameters
-        super().__init__(parent)
-        self.messages = messages
-        self.api_key = api_key
-        self.base_url = base_url # Store the base URL
-        self.model = model
+_SYSTEM_MESSAGE = {"role": "system", "content": SYSTEM_PROMPT} # Shared by every request; never mutated
+PROMPT_CACHE_KEY = "clippy2oh-v1" # Lets providers with prefix caching reuse the system prompt's prefill; None to omit
+# Inputs answered locally without an API call (matched on lowercased text, trailing punctuation ignored)
+DIRECT_REPLIES = {
+    "hi": "Oh hi! 📎 How can I help?!",
+    "hello": "Oh hello! ✨ What are we working on?!",
+    "thanks": "You're so welcome!!",
+    "thank you": "You're so welcome!!",
+}
+CLARIFY_REPLY = "Oh! I didn't quite catch that! 📎 Could you tell me a bit more?!" # For punctuation/emoji-only input when Clippy has said nothing it could be answering
+
+# API Errors
+
+@functools.lru_cache(maxsize=None)
+def api_error_messages():
+    """(exception type, bubble text template) pairs, most specific first. Imports openai."""
+    import openai
+    return (
+        (openai.AuthenticationError, "OpenAI Auth Error: Check API Key/Base URL. Details: {e}"),
+        (openai.APIConnectionError, "OpenAI Connection Error: Could not connect to {base_url}. Details: {e}"),
+        (openai.RateLimitError, "OpenAI Rate Limit Error: Too many requests. Details: {e}"),
+        (openai.APIError, "OpenAI API Error: {status} - {message}"), # Catch other OpenAI API errors
+        (KeyError, "API Response Parse Error: Missing key {e}"),
+        (Exception, "Unexpected Error in API request: {type}: {e}"), # Catch any other unexpected errors
+    )
+
+
+# Image Loading
+
+class PixmapLoaderSignals(QObject):
+    loaded = Signal(str, QImage) # Image path and the decoded, pre-scaled image
+
+class PixmapLoader(QRunnable):
+    """Decodes and scales a still image on a QThreadPool thread."""
+
+    def __init__(self, image_path, size: QSize, signals: PixmapLoaderSignals):
+        super().__init__()
+        self.image_path = image_path
+        self.size = size
+        self.signals = signals
 
     def run(self):
-        print("\n--- OpenAI API Thread Started ---")
-        print(f"API Key Set: {'Yes' if self.api_key else 'No'}")
-        print(f"API Base URL: {self.base_url}")
-        print(f"Model: {self.model}")
-        print(f"Messages Sent ({len(self.messages)}): {self.messages}")
-
-        if not self.api_key:
-            self.result_ready.emit("Error: OPENAI_API_KEY not set.")
-            print("--- API Thread Finished (No Key) ---")
-            return
-        if not self.base_url:
-            self.result_ready.emit("Error: OPENAI_API_BASE not set.")
-            print("--- API Thread Finished (No Base URL) ---")
-            return
-        if not self.model:
-            self.result_ready.emit("Error: OPENAI_MODEL not set.")
-            print("--- API Thread Finished (No Model) ---")
-            return
-
-        try:
-            # Instantiate the OpenAI client
-            # It automatically handles Authorization header
-            client = openai.OpenAI(
-                api_key=self.api_key,
-                base_url=self.base_url,
-            )
-
-            # Make the API call
-            response = client.chat.completions.create(
-                model=self.model,
-                messages=self.messages
-                # You can add other parameters here if needed, e.g., temperature=0.7
-            )
-
-            # Extract the response content
-            assistant_message = response.choices[0].message.content
-            self.result_ready.emit(assistant_message)
-            print("--- API Thread Finished (Success) ---")
-
-        # Handle specific OpenAI errors and general exceptions
-        except openai.AuthenticationError as e:
-            error_message = f"OpenAI Auth Error: Check API Key/Base URL. Details: {e}"
-            print(error_message)
-            self.result_ready.emit(error_message)
-            print("--- API Thread Finished (Auth Error) ---")
-        except openai.APIConnectionError as e:
-            error_message = f"OpenAI Connection Error: Could not connect to {self.base_url}. Details: {e}"
-            print(error_message)
-            self.result_ready.emit(error_message)
-            print("--- API Thread Finished (Connection Error) ---")
-        except openai.RateLimitError as e:
-            error_message = f"OpenAI Rate Limit Error: Too many requests. Details: {e}"
-            print(error_message)
-            self.result_ready.emit(error_message)
-            print("--- API Thread Finished (Rate Limit Error) ---")
-        except openai.APIError as e: # Catch other OpenAI API errors
-            error_message = f"OpenAI API Error: {e.status_code} - {getattr(e, 'message', str(e))}"
-            print(f"APIError: Status={e.status_code}, Response={e.response}")
-            self.result_ready.emit(error_message)
-            print("--- API Thread Finished (API Error) ---")
-        except KeyError as e:
-            # Less likely with the openai library, but keep just in case
-            print(f"KeyError parsing API response: {e}")
-            self.result_ready.emit(f"API Response Parse Error: Missing key {e}")
-            print("--- API Thread Finished (Parse Error) ---")
-        except Exception as e: # Catch any other unexpected errors
-            error_message = f"Unexpected Error in API thread: {type(e).__name__}: {e}"
-            print(error_message)
-            self.result_ready.emit(error_message)
-            print("--- API Thread Finished (Unexpected Error) ---")
+        # QImage is safe off the GUI thread; the QPixmap conversion happens back on it
+        image = QImage(self.image_path)
+        if not image.isNull():
+            target = image.size().scaled(self.size, Qt.AspectRatioMode.KeepAspectRatio)
+            if target != image.size(): # Art authored at the window size is used as-is
+                # Smoothing only pays off when the scale is noticeably away from 1:1
+                ratio = target.width() / image.width()
+                mode = (Qt.TransformationMode.FastTransformation if abs(ratio - 1.0) <= FAST_SCALE_TOLERANCE
+                        else Qt.TransformationMode.SmoothTransformation)
+                image = image.scaled(target, Qt.AspectRatioMode.IgnoreAspectRatio, mode)
+        self.signals.loaded.emit(self.image_path, image)
+
+
+def load_cached_pixmap(image_path):
+    """Returns the QPixmap for image_path, loading it into the application-wide QPixmapCache once."""
+    pixmap = QPixmap()
+    if not QPixmapCache.find(image_path, pixmap):
+        if pixmap.load(image_path):
+            QPixmapCache.insert(image_path, pixmap)
+    return pixmap
 
 
 # Window Classes (Largely Unchanged)
@@ -156,12 +150,9 @@ class CharacterWindow(QMainWindow):
         self.label.setAlignment(Qt.AlignmentFlag.AlignCenter)
         self.label.setSizePolicy(QSizePolicy.Policy.Ignored, QSizePolicy.Policy.Ignored)
         self.setCentralWidget(self.label)
-        self.set_content(IDLE_CHARACTER_PATH) # Assumes exists from main check
+        # Content is supplied by the manager once the character images are decoded
         self.close_button = QPushButton('X', self)
-        self.close_button.setStyleSheet("""
-            QPushButton { border: none; background-color: transparent; color: red; font-weight: bold; font-size: 14px; padding: 0px; }
-            QPushButton:hover { color: darkred; }
-        """)
+        self.close_button.setStyleSheet(CLOSE_BUTTON_CSS)
         self.close_button.setFixedSize(20, 20)
         self._reposition_close_button()
         self.close_button.clicked.connect(self.manager._hide_windows)
@@ -172,31 +163,39 @@ class CharacterWindow(QMainWindow):
     def _reposition_close_button(self):
         self.close_button.move(self.width() - self.close_button.width() - 5, 5)
 
-    def set_content(self, image_path):
-        print(f"Setting character content to: {image_path}")
+    def set_content(self, content):
+        """Shows an already decoded and scaled QPixmap, or a prepared QMovie."""
         movie = self.label.movie()
         if isinstance(movie, QMovie):
+            if movie is content:
+                return
             movie.stop()
             self.label.setMovie(None)
-        self.label.setPixmap(QPixmap())
-        movie = QMovie(image_path)
-        if movie.isValid():
-            print(f"Loading as QMovie: {image_path}")
-            self.label.setMovie(movie)
-            movie.setScaledSize(self.size())
-            movie.start()
+        if isinstance(content, QMovie):
+            self.label.setMovie(content)
+            if self.isVisible(): # Otherwise showEvent starts it
+                content.start()
         else:
-            print(f"Could not load as QMovie, trying QPixmap: {image_path}")
-            pixmap = QPixmap(image_path)
-            if not pixmap.isNull():
-                print(f"Loading as QPixmap: {image_path}")
-                scaled_pixmap = pixmap.scaled(self.size(), Qt.AspectRatioMode.KeepAspectRatio, Qt.TransformationMode.SmoothTransformation)
-                self.label.setPixmap(scaled_pixmap)
+            self.label.setPixmap(content)
+
+    def showEvent(self, event):
+        movie = self.label.movie()
+        if isinstance(movie, QMovie):
+            if movie.state() == QMovie.MovieState.NotRunning:
+                movie.start()
             else:
-                print(f"ERROR: Could not load image/movie from {image_path}. Check file.")
+                movie.setPaused(False)
+        super().showEvent(event)
+
+    def hideEvent(self, event):
+        # No point decoding animation frames nobody can see (e.g. while hidden to the tray)
+        movie = self.label.movie()
+        if isinstance(movie, QMovie) and movie.state() == QMovie.MovieState.Running:
+            movie.setPaused(True)
+        super().hideEvent(event)
 
     def closeEvent(self, event):
-        print("Character window close event triggered.")
+        log.debug("Character window close event triggered.")
         self.manager._hide_windows()
         event.ignore()
 
@@ -236,17 +235,12 @@ class CharacterWindow(QMainWindow):
                 self.position_changed.emit(self.pos())
                 event.accept()
             else:
-                print("Character window clicked.")
+                log.debug("Character window clicked.")
                 self.clicked.emit()
                 event.accept()
         else:
             event.ignore()
 
-    def paintEvent(self, event):
-         painter = QPainter(self)
-         painter.fillRect(self.rect(), QColor(0, 0, 0, 0))
-         super().paintEvent(event)
-
 
 class InputBoxWindow(QWidget):
     text_entered = Signal(str)
@@ -274,34 +268,41 @@ class InputBoxWindow(QWidget):
     def _send_message(self):
         text = self.input_field.text().strip()
         if text:
-            print(f"Input box sending: {text}")
+            log.debug("Input box sending: %s", text)
             self.text_entered.emit(text)
             self.input_field.clear()
             self.hide()
 
     def show_and_focus(self):
-        print("Showing input box")
+        log.debug("Showing input box")
         self.show()
-        self.input_field.setFocus()
         self.raise_()
         self.activateWindow()
-        QApplication.processEvents()
+        # Focus on the next loop iteration, once the window is mapped, instead of pumping events here
+        QTimer.singleShot(0, self._focus_input)
+
+    def _focus_input(self):
+        # Some window managers ignore the first activation request for a window that isn't mapped yet
+        self.activateWindow()
+        self.input_field.setFocus()
 
 
 class SpeechBubbleWindow(QWidget):
+    STATUS_THINKING = "thinking"
+    STATUS_CONFIG_ERROR = "config_error"
+    STATUS_STREAMING = "streaming" # A reply is being appended; nothing else may replace it
+
     def __init__(self):
         super().__init__()
+        self.current_status = None # What the shown text is, so callers needn't read the document back
+        self._shown_text = None # Last text passed to show_bubble; None once streamed chunks are appended
         self.setWindowFlags(Qt.WindowType.FramelessWindowHint | Qt.WindowType.WindowStaysOnTopHint | Qt.WindowType.Tool)
         self.setAttribute(Qt.WidgetAttribute.WA_TranslucentBackground)
         self.setAttribute(Qt.WidgetAttribute.WA_NoSystemBackground)
         self.setFixedSize(BUBBLE_WIDTH, BUBBLE_HEIGHT)
         self.text_browser = QTextBrowser()
         self.text_browser.setReadOnly(True)
-        self.text_browser.setStyleSheet(f"""
-            QTextBrowser {{
-                background-color: transparent; border: none; color: {BUBBLE_BORDER_COLOR.name()};
-            }}
-        """)
+        self.text_browser.setStyleSheet(BUBBLE_TEXT_CSS)
         layout = QVBoxLayout(self)
         text_margin_left = BUBBLE_BORDER_THICKNESS + 15
         text_margin_top = BUBBLE_BORDER_THICKNESS + 5
@@ -310,46 +311,26 @@ class SpeechBubbleWindow(QWidget):
         layout.setContentsMargins(text_margin_left, text_margin_top, text_margin_right, text_margin_bottom)
         layout.addWidget(self.text_browser)
         self.setLayout(layout)
+        # The window has a fixed size, so the bubble outline only needs building once
+        self._bubble_path = self._build_bubble_path()
+        self._bubble_background = self._render_bubble_background()
+        # Streamed chunks are buffered and inserted in batches, so layout runs per flush, not per token
+        self._pending_text = []
+        self._flush_timer = QTimer(self)
+        self._flush_timer.setSingleShot(True)
+        self._flush_timer.setInterval(STREAM_FLUSH_INTERVAL_MS)
+        self._flush_timer.timeout.connect(self.flush_text)
         self.hide()
 
-    def set_text(self, text):
-        self.text_browser.setText(text)
-        self.update()
-
-    def position_window(self, character_pos: QPoint, character_size: QSize):
-        tail_relative_x_in_bubble = 30
-        tail_relative_y_in_bubble = self.height() - 10
-        target_char_x = character_pos.x() + character_size.width() // 2
-        target_char_y = character_pos.y() + character_size.height() * 0.15
-        bubble_x = target_char_x - tail_relative_x_in_bubble
-        bubble_y = target_char_y - tail_relative_y_in_bubble
-        screen_geometry = QApplication.primaryScreen().geometry()
-        bubble_x = max(0, min(int(bubble_x), screen_geometry.width() - self.width()))
-        bubble_y = max(0, min(int(bubble_y), screen_geometry.height() - self.height()))
-        self.move(bubble_x, bubble_y)
-
-    def show_bubble(self, text, character_pos: QPoint, character_size: QSize):
-        print(f"Showing bubble with text: {text[:50]}...")
-        self.set_text(text)
-        self.position_window(character_pos, character_size)
-        self.show()
-        self.raise_()
-        self.activateWindow()
-
-    def paintEvent(self, event):
-        painter = QPainter(self)
-        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
-        painter.setRenderHint(QPainter.RenderHint.SmoothPixmapTransform)
-        painter.fillRect(self.rect(), QColor(0, 0, 0, 0))
+    def _build_bubble_path(self):
         path = QPainterPath()
         body_top = BUBBLE_BORDER_THICKNESS
         body_left = BUBBLE_BORDER_THICKNESS
         body_width = self.width() - 2 * BUBBLE_BORDER_THICKNESS
         body_height = self.height() - 2 * BUBBLE_BORDER_THICKNESS - BUBBLE_TAIL_HEIGHT
         if body_width <= 0 or body_height <= 0:
-             print("Warning: Bubble dimensions too small to draw.")
-             super().paintEvent(event)
-             return
+             log.warning("Bubble dimensions too small to draw.")
+             return path
         bubble_body_rect = QRectF(body_left, body_top, body_width, body_height)
         path.addRoundedRect(bubble_body_rect, BUBBLE_CORNER_RADIUS, BUBBLE_CORNER_RADIUS)
         tail_tip = QPointF(30, self.height() - 10)
@@ -360,9 +341,74 @@ class SpeechBubbleWindow(QWidget):
         tail_base2 = QPointF(tail_base2_x, tail_base_y)
         tail_polygon = QPolygonF([tail_base1, tail_tip, tail_base2])
         path.addPolygon(tail_polygon)
+        return path
+
+    def _render_bubble_background(self):
+        # Rasterise the bubble once so repaints (e.g. per streamed token) are a single blit
+        dpr = self.devicePixelRatioF()
+        background = QPixmap(self.size() * dpr)
+        background.setDevicePixelRatio(dpr)
+        background.fill(Qt.GlobalColor.transparent)
+        painter = QPainter(background)
+        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
         painter.setBrush(BUBBLE_FILL_COLOR)
         painter.setPen(Qt.PenStyle.NoPen)
-        painter.drawPath(path)
+        painter.drawPath(self._bubble_path)
+        painter.end()
+        return background
+
+    def set_text(self, text):
+        self._flush_timer.stop()
+        self._pending_text.clear()
+        # Replies are plain text (the streamed path inserts them that way too), so skip rich-text detection;
+        # the text browser repaints itself and the bubble background doesn't change
+        self.text_browser.setPlainText(text)
+
+    def append_text(self, delta):
+        """Queues a streamed chunk to be appended on the next flush."""
+        self._shown_text = None
+        self._pending_text.append(delta)
+        if not self._flush_timer.isActive():
+            self._flush_timer.start()
+
+    def flush_text(self):
+        """Appends all queued chunks at the end without resetting the document."""
+        self._flush_timer.stop()
+        if not self._pending_text:
+            return
+        self.text_browser.moveCursor(QTextCursor.MoveOperation.End)
+        self.text_browser.insertPlainText("".join(self._pending_text))
+        self._pending_text.clear()
+
+    def position_window(self, character_pos: QPoint, character_size: QSize, screen_rect: QRect):
+        tail_relative_x_in_bubble = 30
+        tail_relative_y_in_bubble = self.height() - 10
+        target_char_x = character_pos.x() + character_size.width() // 2
+        target_char_y = character_pos.y() + character_size.height() * 0.15
+        bubble_x = target_char_x - tail_relative_x_in_bubble
+        bubble_y = target_char_y - tail_relative_y_in_bubble
+        bubble_x = max(0, min(int(bubble_x), screen_rect.width() - self.width()))
+        bubble_y = max(0, min(int(bubble_y), screen_rect.height() - self.height()))
+        self.move(bubble_x, bubble_y)
+
+    def show_bubble(self, text, character_pos: QPoint, character_size: QSize, screen_rect: QRect, status=None):
+        log.debug("Showing bubble with text: %.50s...", text)
+        self.current_status = status
+        if self.isVisible() and text == self._shown_text:
+            return # Already up and positioned (update_window_positions follows the character)
+        self.set_text(text)
+        self._shown_text = text
+        self.position_window(character_pos, character_size, screen_rect)
+        self.show()
+        self.raise_()
+        self.activateWindow()
+
+    def paintEvent(self, event):
+        if self._bubble_background.devicePixelRatio() != self.devicePixelRatioF():
+            self._bubble_background = self._render_bubble_background() # Moved to a screen with another scale
+        # WA_TranslucentBackground already clears the backing store, so no transparent fill first
+        painter = QPainter(self)
+        painter.drawPixmap(0, 0, self._bubble_background)
         super().paintEvent(event)
 
 
@@ -373,25 +419,74 @@ class ApplicationManager:
     STATE_THINKING = "thinking"
 
     def __init__(self):
-        print("Initializing ApplicationManager")
+        log.debug("Initializing ApplicationManager")
         self._app_state = self.STATE_IDLE
         self.character_window = CharacterWindow(self)
+        # Each character image is decoded and scaled once; state changes just swap them
+        self._character_content = {} # Image path -> scaled QPixmap or QMovie
+        self._loader_signals = PixmapLoaderSignals()
+        # Emitted from pool threads; always queued so the slot runs on the GUI thread, where the widgets live
+        self._loader_signals.loaded.connect(self._on_character_image_loaded, Qt.ConnectionType.QueuedConnection)
+        self._load_character_content()
         self.input_box_window = InputBoxWindow()
         self.speech_bubble_window = SpeechBubbleWindow()
-        self.conversation_history = []
-
-        # Store OpenAI config
-        self.openai_api_key = OPENAI_API_KEY
-        self.openai_api_base = OPENAI_API_BASE
-        self.openai_model = OPENAI_MODEL
+        self.conversation_history = deque(maxlen=MAX_HISTORY_MESSAGES) # Oldest messages drop off automatically
+        # Inputs that arrived while a request was in flight; see _flush_pending_inputs
+        self._pending_inputs = []
+
+        # OpenAI config is read by _load_env_and_config once the event loop is running
+        self.openai_api_key = None
+        self.openai_api_base = None
+        self.openai_model = None
+
+        # One async client for the app lifetime, built on first use by _get_client
+        self._http = None
+        self._client = None
+        self._api_task = None # asyncio.Task of the in-flight request, if any
+        self._openai_import_task = None # Background import of openai; see _load_env_and_config
+        self._inflight_text = None # User message that the in-flight request answers
 
         self._setup_tray_icon()
 
-        screen_geometry = QApplication.primaryScreen().geometry()
-        initial_x = screen_geometry.width() - self.character_window.width() - 50
-        initial_y = screen_geometry.height() - self.character_window.height() - 50
+        # Bubble placement is clamped to the primary screen; keep its geometry cached
+        self._screen_rect = QRect()
+        self._tracked_screen = None
+        self._refresh_screen_rect()
+        app = QApplication.instance()
+        app.screenAdded.connect(self._refresh_screen_rect)
+        app.screenRemoved.connect(self._refresh_screen_rect)
+        app.primaryScreenChanged.connect(self._refresh_screen_rect)
+
+        initial_x = self._screen_rect.width() - self.character_window.width() - 50
+        initial_y = self._screen_rect.height() - self.character_window.height() - 50
         self.character_window.move(initial_x, initial_y)
 
+        self.character_window.position_changed.connect(self.update_window_positions)
+        self.character_window.clicked.connect(self.handle_character_clicked)
+        self.input_box_window.text_entered.connect(self.handle_input_entered)
+
+        self.character_window.show()
+        self.update_window_positions(self.character_window.pos())
+        QTimer.singleShot(0, self._load_env_and_config)
+        log.info("ApplicationManager initialized.")
+
+    def _refresh_screen_rect(self, *args):
+        screen = QApplication.primaryScreen()
+        if screen is not self._tracked_screen:
+            # Resolution changes don't add or remove screens, so follow the primary's geometry too
+            screen.geometryChanged.connect(self._refresh_screen_rect)
+            self._tracked_screen = screen
+        self._screen_rect = screen.geometry()
+
+    def _load_env_and_config(self):
+        # Load environment variables from .env file (if it exists).
+        import dotenv
+        dotenv.load_dotenv()
+        log.debug("Environment variables potentially loaded from .env")
+        self.openai_api_key = os.environ.get("OPENAI_API_KEY")
+        self.openai_api_base = os.environ.get("OPENAI_API_BASE") # URL of the API endpoint
+        self.openai_model = os.environ.get("OPENAI_MODEL")
+
         # Check for missing OpenAI config and show warning
         config_warning = None
         if not self.openai_api_key:
@@ -402,40 +497,85 @@ class ApplicationManager:
             config_warning = "Warning: OPENAI_MODEL not set."
 
         if config_warning:
-             print(f"CONFIG WARNING: {config_warning} API calls may fail.")
-             QTimer.singleShot(100, lambda: self.speech_bubble_window.show_bubble(
-                f"{config_warning} Check .env file or environment variables.",
-                self.character_window.pos(),
-                self.character_window.size()
+             log.warning("CONFIG WARNING: %s API calls may fail.", config_warning)
+             QTimer.singleShot(100, lambda: self._show_bubble(
+                f"{config_warning} Check .env file or environment variables."
              ))
+        else:
+            # Pay the openai import in a worker thread now rather than on the first message
+            self._openai_import_task = asyncio.ensure_future(asyncio.to_thread(importlib.import_module, "openai"))
+
+    def _get_client(self):
+        """Returns the shared AsyncOpenAI client, importing openai and building it on first use."""
+        if self._client is None:
+            import httpx
+            import openai
+            # The httpx pool keeps connections to the API host alive, so later turns
+            # skip the TCP + TLS handshake. With HTTP/2 (needs the h2 package, from
+            # httpx[http2]) concurrent requests also share a single connection.
+            self._http = httpx.AsyncClient(
+                http2=importlib.util.find_spec("h2") is not None,
+                # Only one request is ever in flight, so a single kept-alive connection is enough
+                limits=httpx.Limits(max_connections=2, max_keepalive_connections=1, keepalive_expiry=60.0),
+            )
+            # A hung connection fails within a bounded time instead of leaving Clippy thinking forever
+            self._client = openai.AsyncOpenAI(
+                api_key=self.openai_api_key,
+                base_url=self.openai_api_base,
+                http_client=self._http,
+                timeout=httpx.Timeout(API_READ_TIMEOUT, connect=API_CONNECT_TIMEOUT),
+                max_retries=API_MAX_RETRIES,
+            )
+        return self._client
+
+    def _load_character_content(self):
+        size = QSize(CHARACTER_WIDTH, CHARACTER_HEIGHT)
+        for image_path in (IDLE_CHARACTER_PATH, BUSY_CHARACTER_PATH):
+            if QImageReader(image_path).supportsAnimation():
+                movie = QMovie(image_path)
+                if movie.isValid():
+                    log.debug("Loading as QMovie: %s", image_path)
+                    movie.setScaledSize(size)
+                    self._character_content[image_path] = movie
+                    continue
+                log.debug("Could not load as QMovie, trying QPixmap: %s", image_path)
+            # Still images are decoded off the GUI thread; see _on_character_image_loaded
+            QThreadPool.globalInstance().start(PixmapLoader(image_path, size, self._loader_signals))
+        self._show_state_content()
+
+    def _on_character_image_loaded(self, image_path, image):
+        if image.isNull():
+            log.error("Could not load image/movie from %s. Check file.", image_path)
+            return
+        log.debug("Loading as QPixmap: %s", image_path)
+        self._character_content[image_path] = QPixmap.fromImage(image)
+        self._show_state_content()
 
-        self.character_window.position_changed.connect(self.update_window_positions)
-        self.character_window.clicked.connect(self.handle_character_clicked)
-        self.input_box_window.text_entered.connect(self.handle_input_entered)
-
-        self.api_thread = None
-        self.character_window.show()
-        self.update_window_positions(self.character_window.pos())
-        print("ApplicationManager initialized.")
+    def _show_state_content(self):
+        image_path = IDLE_CHARACTER_PATH
+        if self._app_state == self.STATE_THINKING:
+            image_path = BUSY_CHARACTER_PATH
+        content = self._character_content.get(image_path)
+        if content is not None: # Otherwise it's still loading and will be shown when ready
+            self.character_window.set_content(content)
 
     def _set_app_state(self, state):
         if self._app_state == state:
             return
-        print(f"Changing state from {self._app_state} to {state}")
+        log.debug("Changing state from %s to %s", self._app_state, state)
         self._app_state = state
-        image_path = IDLE_CHARACTER_PATH
-        if state == self.STATE_THINKING:
-            image_path = BUSY_CHARACTER_PATH
-        self.character_window.set_content(image_path)
+        self._show_state_content()
 
     def _setup_tray_icon(self):
-        tray_icon_obj = QIcon(TRAY_ICON_PATH)
-        if tray_icon_obj.isNull():
-             print(f"ERROR: Could not load icon from {TRAY_ICON_PATH}.")
+        pixmap = load_cached_pixmap(TRAY_ICON_PATH)
+        if pixmap.isNull():
+             log.error("Could not load icon from %s.", TRAY_ICON_PATH)
              # Create a dummy icon to prevent errors, although it won't look right
-             pixmap = QPixmap(32, 32)
-             pixmap.fill(Qt.GlobalColor.magenta) # Magenta often indicates missing texture
-             tray_icon_obj = QIcon(pixmap)
+             if not QPixmapCache.find(TRAY_ICON_FALLBACK_KEY, pixmap):
+                 pixmap = QPixmap(32, 32)
+                 pixmap.fill(Qt.GlobalColor.magenta) # Magenta often indicates missing texture
+                 QPixmapCache.insert(TRAY_ICON_FALLBACK_KEY, pixmap)
+        tray_icon_obj = QIcon(pixmap)
         self.tray_icon = QSystemTrayIcon(tray_icon_obj, QApplication.instance())
         self.tray_icon.setToolTip("Clippy 2.Oh!") # Updated Tooltip
         self.tray_menu = QMenu()
@@ -453,14 +593,14 @@ class ApplicationManager:
     def _tray_icon_activated(self, reason):
         if reason == QSystemTrayIcon.ActivationReason.Trigger:
             if self.character_window.isVisible():
-                print("Tray icon clicked, hiding windows.")
+                log.debug("Tray icon clicked, hiding windows.")
                 self._hide_windows()
             else:
-                print("Tray icon clicked, showing windows.")
+                log.debug("Tray icon clicked, showing windows.")
                 self._show_windows()
 
     def _show_windows(self):
-        print("Showing windows...")
+        log.debug("Showing windows...")
         self.character_window.show()
         self.update_window_positions(self.character_window.pos())
         self.character_window.raise_()
@@ -470,7 +610,7 @@ class ApplicationManager:
         self._set_app_state(self.STATE_IDLE)
 
     def _hide_windows(self):
-        print("Hiding windows...")
+        log.debug("Hiding windows...")
         self.character_window.hide()
         self.input_box_window.hide()
         self.speech_bubble_window.hide()
@@ -481,127 +621,250 @@ class ApplicationManager:
         input_y = character_pos.y() + char_size.height() + 5
         self.input_box_window.move(input_x, input_y)
         if self.speech_bubble_window.isVisible():
-             self.speech_bubble_window.position_window(self.character_window.pos(), self.character_window.size())
+             self.speech_bubble_window.position_window(character_pos, char_size, self._screen_rect)
              self.speech_bubble_window.raise_()
 
+    def _show_bubble(self, text, status=None):
+        """Shows text in the speech bubble, anchored to the character's current geometry."""
+        character = self.character_window
+        self.speech_bubble_window.show_bubble(text, character.pos(), character.size(), self._screen_rect, status=status)
+
     def handle_character_clicked(self):
-        print("Character clicked signal received.")
+        log.debug("Character clicked signal received.")
         self.speech_bubble_window.hide()
         if self.input_box_window.isVisible():
-            print("Input box visible, hiding.")
+            log.debug("Input box visible, hiding.")
             self.input_box_window.hide()
         else:
-            print("Input box hidden, showing and focusing.")
+            log.debug("Input box hidden, showing and focusing.")
             self.update_window_positions(self.character_window.pos())
             self.input_box_window.show_and_focus()
             self.input_box_window.raise_()
 
     def handle_input_entered(self, text):
-        print(f"Handle input entered: {text}")
-        self.conversation_history.append({"role": "user", "content": text})
-        while len(self.conversation_history) > MAX_HISTORY_MESSAGES:
-             self.conversation_history.pop(0)
-        print(f"Persistent history trimmed to {len(self.conversation_history)} messages.")
+        log.debug("Handle input entered: %s", text)
+        if self._api_task is not None and not self._api_task.done() and text == self._inflight_text:
+            log.debug("Same message already in flight, ignoring duplicate.")
+            self.start_api_request() # Not sent again, but say we're on it ("Already thinking...")
+            return
+        # Sent right away when idle; held and answered together if a request is in flight
+        self._pending_inputs.append(text)
+        self._flush_pending_inputs()
+
+    def _flush_pending_inputs(self):
+        if not self._pending_inputs:
+            return
+        if self._api_task is not None and not self._api_task.done():
+            # Hold the newest MAX_BATCH_SIZE of them until the current reply lands, so history stays in
+            # turn order; _api_task_finished then sends them all as the next request. The bubble is left
+            # alone so a reply that is streaming in isn't overwritten.
+            dropped = len(self._pending_inputs) - MAX_BATCH_SIZE
+            if dropped > 0:
+                log.debug("Discarding %d older held input(s).", dropped)
+                del self._pending_inputs[:dropped]
+            self._set_app_state(self.STATE_THINKING)
+            return
+        inputs, self._pending_inputs = self._pending_inputs, []
+        log.debug("Sending %d batched input(s).", len(inputs))
+        for text in inputs:
+            self.conversation_history.append({"role": "user", "content": text})
+        log.debug("Persistent history trimmed to %d messages.", len(self.conversation_history))
+        if len(inputs) == 1:
+            direct_reply = self._direct_reply(inputs[0])
+            if direct_reply is not None:
+                log.debug("Answering trivial input locally.")
+                self.handle_api_result(True, direct_reply)
+                return
         self.start_api_request()
 
-    def _api_thread_finished(self):
-         print("API thread finished, resetting thread reference and setting state to idle.")
-         self.api_thread = None
+    def _direct_reply(self, text):
+        """Canned reply for trivial or malformed input, or None if it needs the API."""
+        stripped = text.strip()
+        # "y", "3" or "👍" can be real answers to a question Clippy just asked, so only
+        # punctuation/emoji with nothing to reply to counts as malformed
+        history = self.conversation_history # Already ends with this message
+        answering = len(history) >= 2 and history[-2]["role"] == "assistant"
+        if not answering and re.fullmatch(r"[\W_]+", stripped):
+            return CLARIFY_REPLY
+        return DIRECT_REPLIES.get(stripped.lower().rstrip("!.? "))
+
+    def _api_task_finished(self, task):
+         log.debug("API task finished, resetting task reference and setting state to idle.")
+         if self._api_task is task:
+             self._api_task = None
+             self._inflight_text = None
          self._set_app_state(self.STATE_IDLE) # Set back to idle AFTER result processed
+         if self._pending_inputs and not task.cancelled():
+             self._flush_pending_inputs() # Messages sent while we were busy
 
     def start_api_request(self):
-        if self.api_thread is not None and self.api_thread.isRunning():
-            print("API thread already running. Waiting...")
-            current_bubble_text = self.speech_bubble_window.text_browser.toPlainText()
-            if not self.speech_bubble_window.isVisible() or "Thinking..." not in current_bubble_text:
-                 self.speech_bubble_window.show_bubble(
-                    "Already thinking...", self.character_window.pos(), self.character_window.size()
-                 )
+        if self._api_task is not None and not self._api_task.done():
+            log.debug("API request already in flight. Waiting...")
+            bubble = self.speech_bubble_window
+            if bubble.current_status != bubble.STATUS_STREAMING and (
+                    not bubble.isVisible() or bubble.current_status != bubble.STATUS_THINKING):
+                 self._show_bubble("Already thinking...", status=bubble.STATUS_THINKING)
             self._set_app_state(self.STATE_THINKING) # Ensure state is thinking
             return
 
-        # Check for missing config *before* starting thread
+        # Check for missing config *before* starting request
         config_error = None
         if not self.openai_api_key: config_error = "OPENAI_API_KEY not set."
         elif not self.openai_api_base: config_error = "OPENAI_API_BASE not set."
         elif not self.openai_model: config_error = "OPENAI_MODEL not set."
 
         if config_error:
-            print(f"API Config Error: {config_error} Skipping API request.")
-            current_bubble_text = self.speech_bubble_window.text_browser.toPlainText()
-            if not self.speech_bubble_window.isVisible() or config_error not in current_bubble_text:
-                self.speech_bubble_window.show_bubble(
-                    f"API Config Error: {config_error}", self.character_window.pos(), self.character_window.size()
-                )
+            log.warning("API Config Error: %s Skipping API request.", config_error)
+            bubble = self.speech_bubble_window
+            if not bubble.isVisible() or bubble.current_status != bubble.STATUS_CONFIG_ERROR:
+                self._show_bubble(f"API Config Error: {config_error}", status=bubble.STATUS_CONFIG_ERROR)
+            self._drop_unanswered_turns()
             self._set_app_state(self.STATE_IDLE) # Ensure idle if config error
             return
 
-        print("Starting OpenAI API request thread.")
+        log.debug("Starting OpenAI API request task.")
         self._set_app_state(self.STATE_THINKING)
-        self.speech_bubble_window.show_bubble(
-            "Thinking...", self.character_window.pos(), self.character_window.size()
-        )
-
-        system_message = {"role": "system", "content": SYSTEM_PROMPT}
-        messages_to_send = [system_message] + list(self.conversation_history)
-
-        # Use the renamed thread class and pass new parameters
-        self.api_thread = OpenAIAPIThread(
-             messages=messages_to_send,
-             api_key=self.openai_api_key,
-             base_url=self.openai_api_base, # Pass base URL
-             model=self.openai_model
-        )
-        self.api_thread.result_ready.connect(self.handle_api_result)
-        self.api_thread.finished.connect(self.api_thread.deleteLater)
-        self.api_thread.finished.connect(self._api_thread_finished)
-        self.api_thread.start()
-
-    def handle_api_result(self, result_text):
-        print(f"Handle API result: {result_text[:50]}...")
-        # Basic error check (can be refined based on OpenAI error formats)
-        is_error = result_text.startswith(("Error:", "OpenAI")) # Check for custom and OpenAI lib errors
+        self._show_bubble("Thinking...", status=SpeechBubbleWindow.STATUS_THINKING)
+
+        # An immutable snapshot: history keeps changing while the request is in flight.
+        # The deque evicts one message at a time, so skip a reply whose question has already dropped off.
+        messages_to_send = (_SYSTEM_MESSAGE,
+                            *itertools.dropwhile(lambda m: m["role"] != "user", self.conversation_history))
+
+        self._inflight_text = messages_to_send[-1]["content"]
+        self._api_task = asyncio.ensure_future(self._do_request(messages_to_send))
+        self._api_task.add_done_callback(self._api_task_finished)
+
+    async def _do_request(self, messages):
+        """Coroutine that sends one chat completion request and delivers the result."""
+        if log.isEnabledFor(logging.DEBUG): # Skip even building the arguments when not tracing
+            log.debug("--- OpenAI API Request Started ---")
+            log.debug("API Base URL: %s", self.openai_api_base)
+            log.debug("Model: %s", self.openai_model)
+            log.debug("Messages Sent: %d (%d chars)", len(messages), sum(len(m["content"]) for m in messages))
+
+        streamed = False
+        try:
+            stream = await self._get_client().chat.completions.create(
+                model=self.openai_model,
+                messages=messages,
+                stream=True, # Show tokens as they arrive instead of waiting for the whole reply
+                # Sent as a raw body field so older openai versions and servers that don't know it still work
+                extra_body={"prompt_cache_key": PROMPT_CACHE_KEY} if PROMPT_CACHE_KEY else None,
+                # You can add other parameters here if needed, e.g., temperature=0.7
+            )
+
+            # Render each delta into the bubble as it arrives, keeping the full text for history
+            chunks = []
+            async for chunk in stream:
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if not delta:
+                    continue
+                if not streamed:
+                    streamed = True
+                    self._show_bubble("", status=SpeechBubbleWindow.STATUS_STREAMING)
+                chunks.append(delta)
+                self.speech_bubble_window.append_text(delta)
+            self.speech_bubble_window.flush_text()
+            result_text = "".join(chunks)
+            ok = True
+            log.debug("--- API Request Finished (Success) ---")
+
+        except Exception as e: # One handler; the bubble text depends on the error type
+            template = next(text for error_type, text in api_error_messages() if isinstance(e, error_type))
+            result_text = template.format(e=e, type=type(e).__name__, base_url=self.openai_api_base,
+                                          status=getattr(e, "status_code", None), message=getattr(e, "message", e))
+            ok = False
+            log.error(result_text)
+
+        # Coroutines run on the Qt thread, so the UI can be updated directly
+        self.handle_api_result(ok, result_text, streamed=streamed)
+
+    def shutdown(self):
+        """Cancels any in-flight API request; connected to QApplication.aboutToQuit."""
+        if self._api_task is not None and not self._api_task.done():
+            log.info("Cancelling in-flight API request.")
+            self._api_task.cancel()
+
+    async def aclose(self):
+        """Closes the pooled HTTP connections; run once the Qt loop has stopped."""
+        if self._http is not None:
+            log.debug("Closing HTTP connection pool.")
+            await self._http.aclose()
+
+    def _drop_unanswered_turns(self):
+        """Removes the user messages a failed request was answering, so resending them starts from the same history."""
+        while self.conversation_history and self.conversation_history[-1]["role"] == "user":
+            self.conversation_history.pop()
+
+    def handle_api_result(self, ok, result_text, streamed=False):
+        """ok is False when result_text is an error message rather than a reply."""
+        log.debug("Handle API result (ok=%s): %.50s...", ok, result_text)
         display_text = result_text
 
-        if is_error:
-            print("API returned an error.")
+        if not display_text.strip():
+            # An empty completion: nothing worth laying out or remembering, and "Thinking..." shouldn't linger
+            log.debug("API returned an empty response.")
+            self._drop_unanswered_turns()
+            self.speech_bubble_window.current_status = None
+            self.speech_bubble_window.hide()
+            return
+
+        if not ok:
+            log.debug("API returned an error.")
             # Don't add errors to history
+            self._drop_unanswered_turns()
         else:
             # Valid response, add to persistent history
             self.conversation_history.append({"role": "assistant", "content": display_text})
-            while len(self.conversation_history) > MAX_HISTORY_MESSAGES:
-                 self.conversation_history.pop(0)
-            print(f"API returned a response, history updated to {len(self.conversation_history)} messages.")
+            log.debug("API returned a response, history updated to %d messages.", len(self.conversation_history))
 
-        self.speech_bubble_window.show_bubble(
-            display_text, self.character_window.pos(), self.character_window.size()
-        )
-        # State set back to IDLE in _api_thread_finished
+        # A streamed reply is already in the bubble, unless the bubble was hidden while it came in
+        if not ok or not streamed or not self.speech_bubble_window.isVisible():
+            self._show_bubble(display_text)
+        else:
+            self.speech_bubble_window.current_status = None # Stream finished; the bubble may be replaced again
+        # State set back to IDLE in _api_task_finished
 
 
 # Main Execution
 if __name__ == "__main__":
-    print("Starting Clippy 2.Oh! (OpenAI compatible version)")
+    # Quiet by default. Set CLIPPY_DEBUG=1 (or CLIPPY_LOG=DEBUG/INFO) for the per-request / per-event trace.
+    # Only our logger is raised; libraries (httpx, qasync) stay at WARNING.
+    logging.basicConfig(format="%(asctime)s %(levelname)s %(message)s")
+    level_name = "DEBUG" if os.environ.get("CLIPPY_DEBUG") else os.environ.get("CLIPPY_LOG", "WARNING").upper()
+    if isinstance(logging.getLevelName(level_name), int):
+        log.setLevel(level_name)
+    else:
+        log.setLevel(logging.WARNING)
+        log.warning("Unknown CLIPPY_LOG level %r, using WARNING.", level_name)
+    log.info("Starting Clippy 2.Oh! (OpenAI compatible version)")
     # Check for required assets
     required_files = [IDLE_CHARACTER_PATH, BUSY_CHARACTER_PATH, TRAY_ICON_PATH]
     for file_path in required_files:
         if not os.path.exists(file_path):
             raise FileNotFoundError(f"Required application asset not found: {file_path}")
-        print(f"Asset check OK: {file_path}")
-
-    # Check Python package dependency
-    try:
-        import openai
-        print(f"Found OpenAI library version: {openai.__version__}")
-    except ImportError:
-        print("\n--- ERROR ---")
-        print("The 'openai' library is not installed.")
-        print("Please install it by running: pip install openai")
-        print("-------------\n")
+        log.debug("Asset check OK: %s", file_path)
+
+    # Check Python package dependency (without importing it; that happens on the first request)
+    if importlib.util.find_spec("openai") is not None:
+        log.debug("Found OpenAI library.")
+    else:
+        log.error("The 'openai' library is not installed.")
+        log.error("Please install it by running: pip install openai")
         sys.exit(1) # Exit if dependency is missing
 
     app = QApplication(sys.argv)
     app.setQuitOnLastWindowClosed(False)
 
+    # Let asyncio run on top of the Qt event loop so API requests are plain coroutines
+    loop = qasync.QEventLoop(app)
+    asyncio.set_event_loop(loop)
+
     manager = ApplicationManager()
-    sys.exit(app.exec())
\ No newline at end of file
+    app.aboutToQuit.connect(manager.shutdown)
+    with loop:
+        loop.run_forever()
+        loop.run_until_complete(manager.aclose())
\ No newline at end of file